@@ -6,12 +6,13 @@ import os
 import mmap
 import struct
 import logging
-from datetime import datetime, timezone
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 
-from .utils import _generate_cycle_number, _count_changes
-from .dicts import rec_columns, dtype_dict, aux_dtype_dict, state_dict, \
-    multiplier_dict
+from .utils import _generate_cycle_number, _count_changes, _lookup, \
+    _madvise, _join_aux, _records_to_df, _set_dtypes, _local_tz
+from .dicts import dtype_dict, aux_dtype_dict, state_dict
 from .NewareNDAx import read_ndax
 
 logger = logging.getLogger('newarenda')
@@ -71,6 +72,7 @@ def read_nda(file, software_cycle_number, cycle_mode='chg'):
     """
     with open(file, "rb") as f:
         mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _madvise(mm)
 
         if mm.read(6) != b'NEWARE':
             logger.error(f"{file} does not appear to be a Neware file.")
@@ -94,37 +96,32 @@ def read_nda(file, software_cycle_number, cycle_mode='chg'):
 
         # version specific settings
         if nda_version == 29:
-            output, aux = _read_nda_29(mm)
+            df, aux = _read_nda_29(mm)
         elif nda_version == 130:
-            output, aux = _read_nda_130(mm)
+            df, aux = _read_nda_130(mm)
         else:
             logger.error(f"nda version {nda_version} is not yet supported!")
             raise NotImplementedError(f"nda version {nda_version} is not yet supported!")
 
-    # Create DataFrame and sort by Index
-    df = pd.DataFrame(output, columns=rec_columns)
-    df.drop_duplicates(subset='Index', inplace=True)
-
-    if not df['Index'].is_monotonic_increasing:
-        df.sort_values('Index', inplace=True)
-
-    df.reset_index(drop=True, inplace=True)
+    # Drop duplicates and sort by Index unless it is already strictly increasing
+    Index = df['Index'].to_numpy()
+    if not (Index[1:] > Index[:-1]).all():
+        _, first = np.unique(Index, return_index=True)
+        df = df.take(first).reset_index(drop=True)
 
     # Join temperature data
-    aux_df = pd.DataFrame(aux, columns=['Index', 'Aux', 'T', 'V'])
-    aux_df.drop_duplicates(inplace=True)
+    aux_df = aux.drop_duplicates()
     if not aux_df.empty:
         aux_df = aux_df.astype(
             {k: aux_dtype_dict[k] for k in aux_dtype_dict.keys() & aux_df.columns})
-        pvt_df = aux_df.pivot(index='Index', columns='Aux')
-        pvt_df.columns = pvt_df.columns.map(lambda x: ''.join(map(str, x)))
-        df = df.join(pvt_df, on='Index')
+        df = _join_aux(df, aux_df)
 
     # Postprocessing
+    df['Status'] = df['Status'].cat.remove_unused_categories()
     df['Step'] = _count_changes(df['Step'])
     if software_cycle_number:
         df['Cycle'] = _generate_cycle_number(df, cycle_mode)
-    df = df.astype(dtype=dtype_dict)
+    _set_dtypes(df, dtype_dict)
 
     return df
 
@@ -148,34 +145,34 @@ def _read_nda_29(mm):
 
     # Identify the beginning of the data section
     record_len = 86
-    identifier = b'\x00\x00\x00\x00\x55\x00'
-    header = mm.find(identifier)
-    if header == -1:
+    identifier = np.frombuffer(b'\x00\x00\x00\x00\x55\x00', dtype=np.uint8)
+    buf = np.frombuffer(mm, dtype=np.uint8)
+    header = np.flatnonzero(buf[4:mm_size-1] == 0x55)
+    for i, b in enumerate(identifier):
+        header = header[buf[header + i] == b]
+
+    # The first record must have a non-zero Status and be followed by another record
+    valid = np.ones(len(header), dtype=bool)
+    following = header + 4 + record_len
+    i = following < mm_size
+    valid[i] = (buf[following[i]] == 85) & (buf[header[i] + 4 + 12] != 0)
+    if not valid.any():
         logger.error("File does not contain any valid records.")
         raise EOFError("File does not contain any valid records.")
-    while (((mm[header + 4 + record_len] != 85)
-            | (not _valid_record(mm[header+4:header+4+record_len])))
-            if header + 4 + record_len < mm_size
-            else False):
-        header = mm.find(identifier, header + 4)
-    mm.seek(header + 4)
+    header = int(header[valid.argmax()])
 
     # Read data records
-    output = []
-    aux = []
-    while mm.tell() < mm_size:
-        bytes = mm.read(record_len)
-        if len(bytes) == record_len:
-
-            # Check for a data record
-            if (bytes[0:2] == b'\x55\x00'
-                    and bytes[82:87] == b'\x00\x00\x00\x00'):
-                output.append(_bytes_to_list(bytes))
-
-            # Check for an auxiliary record
-            elif (bytes[0:1] == b'\x65'
-                    and bytes[82:87] == b'\x00\x00\x00\x00'):
-                aux.append(_aux_bytes_to_list(bytes))
+    n = (mm_size - header - 4) // record_len
+    rec = np.frombuffer(mm, dtype=_nda_29_dtype, count=n, offset=header + 4)
+    valid = rec['Tail'] == 0
+
+    # Data records are marked with b'\x55\x00'
+    data = rec[valid & (rec['Marker'] == 0x0055)
+               & (rec['Index'] != 0) & (rec['Status'] != 0)]
+    output = _records_to_df(data)
+
+    # Auxiliary records are marked with b'\x65'
+    aux = _aux_records_to_df(mm, header + 4, record_len, valid & (rec['Tag'] == 0x65))
 
     return output, aux
 
@@ -186,33 +183,34 @@ def _read_nda_130(mm):
 
     # Identify the beginning of the data section
     record_len = 88
+    rec_dtype = _nda_130_dtype
     identifier = mm[1024:1030]
-    if mm[1024:1025] == b'\x55':  # BTS 9.1
+    if mm[1024] == 0x55:  # BTS 9.1
         # Find next record and get length
         record_len = mm.find(mm[1024:1026], 1026) - 1024
-    mm.seek(1024)
-
-    # Read data records
-    output = []
-    aux = []
-    while mm.tell() < mm_size:
-        bytes = mm.read(record_len)
-        if len(bytes) == record_len:
-
-            # Check for a data record
-            if bytes[0:1] == b'\x55':
-                output.append(_bytes_to_list_BTS91(bytes))
-                if record_len == 56:
-                    aux.append(_aux_bytes_to_list_BTS91(bytes))
-            elif bytes[0:6] == identifier:
-                output.append(_bytes_to_list_BTS9(bytes[4:]))
-
-            # Check for an auxiliary record
-            elif bytes[0:5] == b'\x00\x00\x00\x00\x65':
-                aux.append(_aux_bytes_to_list(bytes[4:]))
-
-            elif bytes[0:1] == b'\x81':
-                break
+        rec_dtype = _nda_130_dtype_BTS91(record_len)
+
+    # Read data records up to the first b'\x81' record
+    n = (mm_size - 1024) // record_len
+    rec = np.frombuffer(mm, dtype=rec_dtype, count=n, offset=1024)
+    end = np.flatnonzero(rec['Head'][:, 0] == 0x81)
+    if end.size:
+        rec = rec[:end[0]]
+
+    # Check for auxiliary records
+    head = np.frombuffer(b'\x00\x00\x00\x00\x65', dtype=np.uint8)
+    aux = _aux_records_to_df(mm, 1028, record_len, (rec['Head'][:, :5] == head).all(axis=1))
+
+    if identifier[0] == 0x55:  # BTS 9.1
+        data = rec[rec['Head'][:, 0] == 0x55]
+        output = _records_to_df_BTS91(data)
+        if record_len == 56:
+            aux_BTS91 = _aux_records_to_df_BTS91(data)
+            aux = pd.concat([aux_BTS91, aux], ignore_index=True) if not aux.empty else aux_BTS91
+    else:
+        head = np.frombuffer(identifier, dtype=np.uint8)
+        data = rec[(rec['Head'] == head).all(axis=1)]
+        output = _records_to_df_BTS9(data)
 
     # Find footer data block
     footer = mm.rfind(b'\x06\x00\xf0\x1d\x81\x00\x03\x00\x61\x90\x71\x90\x02\x7f\xff\x00', 1024)
@@ -234,116 +232,125 @@ def _read_nda_130(mm):
     return output, aux
 
 
-def _valid_record(bytes):
-    """Helper function to identify a valid record"""
-    # Check for a non-zero Status
-    [Status] = struct.unpack('<B', bytes[12:13])
-    return (Status != 0)
-
-
-def _bytes_to_list(bytes):
-    """Helper function for interpreting a byte string"""
-
-    # Extract fields from byte string
-    [Index, Cycle, Step] = struct.unpack('<III', bytes[2:14])
-    [Status, Jump, Time, Voltage, Current] = struct.unpack('<BBQii', bytes[12:30])
-    [Charge_capacity, Discharge_capacity,
-     Charge_energy, Discharge_energy] = struct.unpack('<qqqq', bytes[38:70])
-    [Y, M, D, h, m, s] = struct.unpack('<HBBBBB', bytes[70:77])
-    [Range] = struct.unpack('<i', bytes[78:82])
-
-    # Index and should not be zero
-    if Index == 0 or Status == 0:
-        return []
-
-    multiplier = multiplier_dict[Range]
-
-    # Create a dictionary for the record
-    list = [
-        Index,
-        Cycle + 1,
-        Step,
-        state_dict[Status],
-        Time/1000,
-        Voltage/10000,
-        Current*multiplier,
-        Charge_capacity*multiplier/3600,
-        Discharge_capacity*multiplier/3600,
-        Charge_energy*multiplier/3600,
-        Discharge_energy*multiplier/3600,
-        datetime(Y, M, D, h, m, s)
-    ]
-    return list
-
-
-def _bytes_to_list_BTS9(bytes):
-    """Helper function to interpret byte strings from BTS9"""
-    [Step, Status] = struct.unpack('<BB', bytes[5:7])
-    [Index] = struct.unpack('<I', bytes[12:16])
-    [Time, Voltage, Current] = struct.unpack('<Qff', bytes[24:40])
-    [Charge_Capacity, Charge_Energy,
-     Discharge_Capacity, Discharge_Energy,
-     Date] = struct.unpack('<ffffQ', bytes[48:72])
-
-    # Create a dictionary for the record
-    list = [
-        Index,
-        0,
-        Step,
-        state_dict[Status],
-        Time/1e6,
-        Voltage,
-        Current,
-        Charge_Capacity/3600,
-        Discharge_Capacity/3600,
-        Charge_Energy/3600,
-        Discharge_Energy/3600,
-        datetime.fromtimestamp(Date/1e6, timezone.utc).astimezone()
-    ]
-    return list
-
-
-def _bytes_to_list_BTS91(bytes):
-    """Helper function to interpret byte strings from BTS9.1"""
-    [Step, Status] = struct.unpack('<BB', bytes[2:4])
-    [Index, Time, Time_ns] = struct.unpack('<III', bytes[8:20])
-    [Current, Voltage, Capacity, Energy] = struct.unpack('<ffff', bytes[20:36])
-    [Date, Date_ns] = struct.unpack('<II', bytes[44:52])
+# Record layout for nda version 29
+_nda_29_dtype = np.dtype({
+    'names': ['Marker', 'Tag', 'Index', 'Cycle', 'Step', 'Status', 'Time',
+              'Voltage', 'Current', 'Charge_Capacity', 'Discharge_Capacity',
+              'Charge_Energy', 'Discharge_Energy', 'Y', 'M', 'D', 'h', 'm',
+              's', 'Range', 'Tail'],
+    'formats': ['<u2', 'u1', '<u4', '<u4', '<u4', 'u1', '<u8',
+                '<i4', '<i4', '<i8', '<i8',
+                '<i8', '<i8', '<u2', 'u1', 'u1', 'u1', 'u1',
+                'u1', '<i4', '<u4'],
+    'offsets': [0, 0, 2, 6, 10, 12, 14,
+                22, 26, 38, 46,
+                54, 62, 70, 72, 73, 74, 75,
+                76, 78, 82],
+    'itemsize': 86})
+
+
+# Record layout for nda version 130, BTS 9
+_nda_130_dtype = np.dtype({
+    'names': ['Head', 'Step', 'Status', 'Index', 'Time', 'Voltage',
+              'Current', 'Charge_Capacity', 'Charge_Energy',
+              'Discharge_Capacity', 'Discharge_Energy', 'Date'],
+    'formats': [('u1', 6), 'u1', 'u1', '<u4', '<u8', '<f4',
+                '<f4', '<f4', '<f4',
+                '<f4', '<f4', '<u8'],
+    'offsets': [0, 9, 10, 16, 28, 36,
+                40, 52, 56,
+                60, 64, 68],
+    'itemsize': 88})
+
+
+@lru_cache(maxsize=None)
+def _nda_130_dtype_BTS91(record_len):
+    """Record layout for nda version 130, BTS 9.1"""
+    names = ['Head', 'Step', 'Status', 'Index', 'Time', 'Time_ns',
+             'Current', 'Voltage', 'Capacity', 'Energy', 'Date', 'Date_ns']
+    formats = [('u1', 6), 'u1', 'u1', '<u4', '<u4', '<u4',
+               '<f4', '<f4', '<f4', '<f4', '<u4', '<u4']
+    offsets = [0, 2, 3, 8, 12, 16,
+               20, 24, 28, 32, 44, 48]
+    if record_len == 56:
+        names.append('T')
+        formats.append('<f4')
+        offsets.append(52)
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                     'itemsize': record_len})
+
+
+def _records_to_df_BTS9(rec):
+    """Helper function to interpret records from BTS9"""
+    df = pd.DataFrame({
+        'Index': rec['Index'],
+        'Cycle': 0,
+        'Step': rec['Step'],
+        'Status': _lookup(state_dict, rec['Status']),
+        'Time': rec['Time']/1e6,
+        'Voltage': rec['Voltage'],
+        'Current(mA)': rec['Current'],
+        'Charge_Capacity(mAh)': rec['Charge_Capacity']/3600,
+        'Discharge_Capacity(mAh)': rec['Discharge_Capacity']/3600,
+        'Charge_Energy(mWh)': rec['Charge_Energy']/3600,
+        'Discharge_Energy(mWh)': rec['Discharge_Energy']/3600,
+        'Timestamp': pd.to_datetime(rec['Date'], unit='us', utc=True).tz_convert(_local_tz())
+    })
+    return df
+
+
+def _records_to_df_BTS91(rec):
+    """Helper function to interpret records from BTS9.1"""
+    Capacity = rec['Capacity'].astype('float64')
+    Energy = rec['Energy'].astype('float64')
+    Date = rec['Date'].astype('int64')*1000000000 + rec['Date_ns']
 
     # Convert capacity and energy to charge and discharge fields
-    Charge_Capacity = 0 if Capacity < 0 else Capacity
-    Discharge_Capacity = 0 if Capacity > 0 else abs(Capacity)
-    Charge_Energy = 0 if Energy < 0 else Energy
-    Discharge_Energy = 0 if Energy > 0 else abs(Energy)
-
-    # Create a dictionary for the record
-    list = [
-        Index,
-        0,
-        Step,
-        state_dict[Status],
-        Time + 1e-9*Time_ns,
-        Voltage,
-        Current,
-        Charge_Capacity/3600,
-        Discharge_Capacity/3600,
-        Charge_Energy/3600,
-        Discharge_Energy/3600,
-        datetime.fromtimestamp(Date + 1e-9*Date_ns, timezone.utc).astimezone()
-    ]
-    return list
-
-
-def _aux_bytes_to_list(bytes):
-    """Helper function for intepreting auxiliary records"""
-    [Aux, Index] = struct.unpack('<BI', bytes[1:6])
-    [V] = struct.unpack('<i', bytes[22:26])
-    [T] = struct.unpack('<h', bytes[34:36])
-
-    return [Index, Aux, T/10, V/10000]
-
-
-def _aux_bytes_to_list_BTS91(bytes):
-    [Index] = struct.unpack('<I', bytes[8:12])
-    [T] = struct.unpack('<f', bytes[52:56])
-    return [Index, 1, T, None]
+    df = pd.DataFrame({
+        'Index': rec['Index'],
+        'Cycle': 0,
+        'Step': rec['Step'],
+        'Status': _lookup(state_dict, rec['Status']),
+        'Time': rec['Time'] + 1e-9*rec['Time_ns'],
+        'Voltage': rec['Voltage'],
+        'Current(mA)': rec['Current'],
+        'Charge_Capacity(mAh)': np.where(Capacity < 0, 0, Capacity)/3600,
+        'Discharge_Capacity(mAh)': np.where(Capacity > 0, 0, np.abs(Capacity))/3600,
+        'Charge_Energy(mWh)': np.where(Energy < 0, 0, Energy)/3600,
+        'Discharge_Energy(mWh)': np.where(Energy > 0, 0, np.abs(Energy))/3600,
+        'Timestamp': pd.to_datetime(Date, unit='ns', utc=True).tz_convert(_local_tz())
+    })
+    return df
+
+
+# Layout of the fields in an auxiliary record
+_nda_aux_dtype = np.dtype({
+    'names': ['Aux', 'Index', 'V', 'T'],
+    'formats': ['u1', '<u4', '<i4', '<i2'],
+    'offsets': [1, 2, 22, 34],
+    'itemsize': 36})
+
+
+def _aux_records_to_df(mm, offset, record_len, mask):
+    """
+    Helper function for intepreting auxiliary records. mask selects the
+    auxiliary records among those of record_len bytes starting at offset.
+    """
+    rec = np.ndarray(len(mask), dtype=_nda_aux_dtype, buffer=mm,
+                     offset=offset, strides=record_len)[mask]
+    return pd.DataFrame({
+        'Index': rec['Index'],
+        'Aux': rec['Aux'],
+        'T': rec['T']/10,
+        'V': rec['V']/10000
+    })
+
+
+def _aux_records_to_df_BTS91(rec):
+    """Helper function to interpret auxiliary records from BTS9.1"""
+    return pd.DataFrame({
+        'Index': rec['Index'],
+        'Aux': 1,
+        'T': rec['T'],
+        'V': np.nan
+    })
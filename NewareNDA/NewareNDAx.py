@@ -2,23 +2,26 @@
 # Author: Daniel Cogswell
 # Email: danielcogswell@ses.ai
 
-import sys
 import mmap
 import struct
 import logging
-import tempfile
 import zipfile
 import re
-from datetime import datetime, timezone
+from datetime import datetime
 import xml.etree.ElementTree as ET
+import numpy as np
 import pandas as pd
 
-from .utils import _generate_cycle_number, _count_changes
-from .dicts import rec_columns, dtype_dict, aux_dtype_dict, state_dict, \
-    multiplier_dict
+from .utils import _generate_cycle_number, _count_changes, _lookup, _records_to_df, \
+    _join_aux, _madvise, _set_dtypes
+from .dicts import rec_columns, dtype_dict, aux_dtype_dict, state_dict
 
 logger = logging.getLogger('newarenda')
 
+# Aux ndc filenames either carry a channel number or the aux_id directly
+_aux_ch_re = re.compile("data_AUX_([0-9]+)_[0-9]+_[0-9]+[.]ndc")
+_aux_id_re = re.compile(".*_([0-9]+)[.]ndc")
+
 
 def read_ndax(file, software_cycle_number=False, cycle_mode='chg'):
     """
@@ -34,14 +37,12 @@ def read_ndax(file, software_cycle_number=False, cycle_mode='chg'):
     Returns:
         df (pd.DataFrame): DataFrame containing all records in the file
     """
-    with tempfile.TemporaryDirectory() as tmpdir:
-        zf = zipfile.PyZipFile(file)
+    with zipfile.PyZipFile(file) as zf:
 
         # Read version information
         try:
-            version_info = zf.extract('VersionInfo.xml', path=tmpdir)
-            with open(version_info, 'r', encoding='gb2312') as f:
-                config = ET.fromstring(f.read()).find('config/ZwjVersion')
+            version_info = zf.read('VersionInfo.xml').decode('gb2312')
+            config = ET.fromstring(version_info).find('config/ZwjVersion')
             logger.info(f"Server version: {config.attrib['SvrVer']}")
             logger.info(f"Client version: {config.attrib['CurrClientVer']}")
             logger.info(f"Control unit version: {config.attrib['ZwjVersion']}")
@@ -51,9 +52,8 @@ def read_ndax(file, software_cycle_number=False, cycle_mode='chg'):
 
         # Read active mass
         try:
-            step = zf.extract('Step.xml', path=tmpdir)
-            with open(step, 'r', encoding='gb2312') as f:
-                config = ET.fromstring(f.read()).find('config')
+            step = zf.read('Step.xml').decode('gb2312')
+            config = ET.fromstring(step).find('config')
             active_mass = float(config.find('Head_Info/SCQ').attrib['Value'])
             logger.info(f"Active mass: {active_mass/1000} mg")
         except Exception:
@@ -62,9 +62,8 @@ def read_ndax(file, software_cycle_number=False, cycle_mode='chg'):
         # Read aux channel mapping from TestInfo.xml
         aux_ch_dict = {}
         try:
-            step = zf.extract('TestInfo.xml', path=tmpdir)
-            with open(step, 'r', encoding='gb2312') as f:
-                config = ET.fromstring(f.read()).find('config')
+            test_info = zf.read('TestInfo.xml').decode('gb2312')
+            config = ET.fromstring(test_info).find('config')
 
             for child in config.find("TestInfo"):
                 aux_ch_dict.update({int(child.attrib['RealChlID']): int(child.attrib['AuxID'])})
@@ -73,63 +72,79 @@ def read_ndax(file, software_cycle_number=False, cycle_mode='chg'):
             pass
 
         # Try to read data.ndc
-        if 'data.ndc' in zf.namelist():
-            data_file = zf.extract('data.ndc', path=tmpdir)
-            data_df = read_ndc(data_file)
-        else:
+        if 'data.ndc' not in zf.namelist():
             raise NotImplementedError("File type not yet supported!")
 
         # Some ndax have data spread across 3 different ndc files. Others have
         # all data in data.ndc.
         # Check if data_runInfo.ndc and data_step.ndc exist
-        if all(i in zf.namelist() for i in ['data_runInfo.ndc', 'data_step.ndc']):
-
-            # Read data from separate files
-            runInfo_file = zf.extract('data_runInfo.ndc', path=tmpdir)
-            step_file = zf.extract('data_step.ndc', path=tmpdir)
-            runInfo_df = read_ndc(runInfo_file)
-            step_df = read_ndc(step_file)
-
-            # Merge dataframes
-            data_df = data_df.merge(runInfo_df, how='left', on='Index')
-            data_df['Step'] = data_df['Step'].ffill()
-            data_df = data_df.merge(step_df, how='left', on='Step').reindex(
-                columns=rec_columns)
-
-            # Fill in missing data - Neware appears to fabricate data
-            if data_df.isnull().any(axis=None):
-                _data_interpolation(data_df)
+        split = all(i in zf.namelist() for i in ['data_runInfo.ndc', 'data_step.ndc'])
 
-        # Read and merge Aux data from ndc files
-        aux_df = pd.DataFrame([])
+        # Identify Aux data ndc files
+        aux_ids = {}
         for f in zf.namelist():
 
             # If the filename contains a channel number, convert to aux_id
-            m = re.search("data_AUX_([0-9]+)_[0-9]+_[0-9]+[.]ndc", f)
+            m = _aux_ch_re.search(f)
             if m:
                 ch = int(m[1])
-                aux_id = aux_ch_dict[ch]
+                aux_ids[f] = aux_ch_dict[ch]
             else:
-                m = re.search(".*_([0-9]+)[.]ndc", f)
+                m = _aux_id_re.search(f)
                 if m:
-                    aux_id = int(m[1])
+                    aux_ids[f] = int(m[1])
 
-            if m:
-                aux_file = zf.extract(f, path=tmpdir)
-                aux = read_ndc(aux_file)
-                aux['Aux'] = aux_id
-                aux_df = pd.concat([aux_df, aux], ignore_index=True)
+        # Decode all ndc files
+        names = ['data.ndc'] + (['data_runInfo.ndc', 'data_step.ndc'] if split else [])
+        ndc = _read_ndc_members(zf, names + list(aux_ids))
+        data_df = ndc['data.ndc']
+
+        if split:
+
+            # Read data from separate files
+            runInfo_df = ndc['data_runInfo.ndc']
+            step_df = ndc['data_step.ndc']
+
+            # Merge dataframes
+            left, right = _join_indexers(runInfo_df['Index'].to_numpy(),
+                                         data_df['Index'].to_numpy())
+            columns = {c: _take(data_df[c], left) for c in data_df.columns}
+            columns.update({c: _take(runInfo_df[c], right)
+                            for c in runInfo_df.columns if c != 'Index'})
+            columns['Step'] = _ffill(columns['Step'].astype('float64'))
+            left, right = _join_indexers(step_df['Step'].to_numpy(), columns['Step'])
+            columns = {c: v[left] for c, v in columns.items()}
+            columns.update({c: _take(step_df[c], right)
+                            for c in step_df.columns if c != 'Step'})
+            data_df = pd.DataFrame({c: columns.get(c, np.nan) for c in rec_columns})
+            data_df['Status'] = data_df['Status'].cat.remove_unused_categories()
+
+            # Fill in missing data - Neware appears to fabricate data
+            if data_df.isnull().any(axis=None):
+                _data_interpolation(data_df)
+
+        # Merge Aux data from ndc files
+        aux_list = []
+        for f, aux_id in aux_ids.items():
+            aux = ndc[f]
+            aux['Aux'] = aux_id
+            aux_list.append(aux)
+        aux_df = pd.concat(aux_list, ignore_index=True) if aux_list else pd.DataFrame([])
         if not aux_df.empty:
             aux_df = aux_df.astype(
                 {k: aux_dtype_dict[k] for k in aux_dtype_dict.keys() & aux_df.columns})
-            pvt_df = aux_df.pivot(index='Index', columns='Aux')
-            pvt_df.columns = pvt_df.columns.map(lambda x: ''.join(map(str, x)))
-            data_df = data_df.join(pvt_df, on='Index')
+            data_df = _join_aux(data_df, aux_df)
 
     if software_cycle_number:
         data_df['Cycle'] = _generate_cycle_number(data_df, cycle_mode)
 
-    return data_df.astype(dtype=dtype_dict)
+    _set_dtypes(data_df, dtype_dict)
+    return data_df
+
+
+def _read_ndc_members(zf, names):
+    """Read ndc files from an ndax archive"""
+    return {f: read_ndc(zf.read(f)) for f in names}
 
 
 def _data_interpolation(df):
@@ -140,44 +155,128 @@ def _data_interpolation(df):
     logger.warning("IMPORTANT: This ndax has missing data. The output from "
                    "NewareNDA contains interpolated data!")
 
-    # Identify the valid data
-    nan_mask = df['Time'].notnull()
+    # Identify the valid data and the missing records that follow it
+    nan_mask = df['Time'].notnull().to_numpy()
+    last = _last_valid(nan_mask)
+    i = np.flatnonzero(~nan_mask & (last >= 0))
 
-    # Group by step and run 'inside' interpolation on Time
-    df['Time'] = df.groupby('Step')['Time'].transform(
-        lambda x: pd.Series.interpolate(x, limit_area='inside'))
+    # Run 'inside' interpolation on Time within each Step
+    Time = _interpolate_inside(df['Time'].to_numpy(dtype='float64'),
+                               df['Step'].to_numpy())
 
-    # Perform extrapolation to generate the remaining missing Time
-    nan_mask2 = df['Time'].notnull()
-    time_inc = df['Time'].diff().ffill().groupby(nan_mask2.cumsum()).cumsum()
-    time = df['Time'].ffill() + time_inc.shift()
-    df['Time'] = df['Time'].where(nan_mask2, time)
+    # Perform extrapolation with the last time increment to generate the remaining missing Time
+    last_time = _last_valid(~np.isnan(Time))
+    j = np.flatnonzero(np.isnan(Time) & (last_time >= 0))
+    dt = _ffill(np.diff(Time, prepend=np.nan))
+    Time[j] = Time[last_time[j]] + _sum_since(dt, last_time, j)
+    df['Time'] = Time
 
     # Fill in missing Timestamps
-    time_inc = df['Time'].diff().groupby(nan_mask.cumsum()).cumsum()
-    timestamp = df['Timestamp'].ffill() + \
-        pd.to_timedelta(time_inc.shift().fillna(0), unit='s')
-    df['Timestamp'] = df['Timestamp'].where(nan_mask, timestamp)
-
-    # Integrate to get capacity and fill missing values
-    capacity = df['Time'].diff()*abs(df['Current(mA)'])/3600
-    inc = capacity.groupby(nan_mask.cumsum()).cumsum()
-    chg = df['Charge_Capacity(mAh)'].ffill() + \
-        inc.where(df['Current(mA)'] > 0, 0).shift()
-    dch = df['Discharge_Capacity(mAh)'].ffill() + \
-        inc.where(df['Current(mA)'] < 0, 0).shift()
-    df['Charge_Capacity(mAh)'] = df['Charge_Capacity(mAh)'].where(nan_mask, chg)
-    df['Discharge_Capacity(mAh)'] = df['Discharge_Capacity(mAh)'].where(nan_mask, dch)
-
-    # Integrate to get energy and fill missing values
-    energy = capacity*df['Voltage']
-    inc = energy.groupby(nan_mask.cumsum()).cumsum()
-    chg = df['Charge_Energy(mWh)'].ffill() + \
-        inc.where(df['Current(mA)'] > 0, 0).shift()
-    dch = df['Discharge_Energy(mWh)'].ffill() + \
-        inc.where(df['Current(mA)'] < 0, 0).shift()
-    df['Charge_Energy(mWh)'] = df['Charge_Energy(mWh)'].where(nan_mask, chg)
-    df['Discharge_Energy(mWh)'] = df['Discharge_Energy(mWh)'].where(nan_mask, dch)
+    dt = np.diff(Time, prepend=np.nan)
+    elapsed = np.nan_to_num(_sum_since(dt, last, i))
+    Timestamp = df['Timestamp'].array.copy()
+    last_timestamp = _last_valid(df['Timestamp'].notnull().to_numpy())
+    Timestamp[i] = Timestamp[last_timestamp[i]] + _to_timedelta(elapsed)
+    Timestamp[i[last_timestamp[i] < 0]] = pd.NaT
+    df['Timestamp'] = Timestamp
+
+    # Integrate to get capacity and energy and fill missing values
+    current = df['Current(mA)'].to_numpy(dtype='float64')
+    capacity = dt*np.abs(current)/3600
+    energy = capacity*df['Voltage'].to_numpy(dtype='float64')
+    capacity = _sum_since(capacity, last, i)
+    energy = _sum_since(energy, last, i)
+
+    # Increments go to charge or discharge by the sign of the previous current
+    chg = current[i - 1] > 0
+    dch = current[i - 1] < 0
+    for column, inc, sign in [('Charge_Capacity(mAh)', capacity, chg),
+                              ('Discharge_Capacity(mAh)', capacity, dch),
+                              ('Charge_Energy(mWh)', energy, chg),
+                              ('Discharge_Energy(mWh)', energy, dch)]:
+        values = df[column].to_numpy(dtype='float64', copy=True)
+        values[i] = _ffill(values)[i] + np.where(sign, inc, 0)
+        df[column] = values
+
+
+def _last_valid(mask):
+    """Position of the last True element at or before each element, -1 if none"""
+    return np.maximum.accumulate(np.where(mask, np.arange(len(mask)), -1))
+
+
+def _ffill(values):
+    """Forward fill NaN values in a float array"""
+    last = _last_valid(~np.isnan(values))
+    return np.where(last >= 0, values[last], np.nan)
+
+
+def _join_indexers(keys, values):
+    """
+    Row positions for a left join of values onto keys, equivalent to
+    pd.merge(how='left'). Unmatched values get a position of -1 in keys.
+    """
+    if len(keys) == 0:
+        return np.arange(len(values)), np.full(len(values), -1)
+    order = np.argsort(keys, kind='stable')
+    start = np.searchsorted(keys, values, side='left', sorter=order)
+    count = np.searchsorted(keys, values, side='right', sorter=order) - start
+
+    # Repeat each value once per matching key
+    n = np.maximum(count, 1)
+    left = np.repeat(np.arange(len(values)), n)
+    offset = np.arange(len(left)) - np.repeat(np.cumsum(n) - n, n)
+    right = order[np.minimum(start[left] + offset, len(keys) - 1)]
+    return left, np.where(count[left] > 0, right, -1)
+
+
+def _take(column, i):
+    """Gather column values at positions i, missing where i is -1"""
+    values = column.to_numpy() if isinstance(column.dtype, np.dtype) else column.array
+    return pd.api.extensions.take(values, i, allow_fill=True)
+
+
+def _sum_since(values, last, i):
+    """
+    Sum of values from the last valid record up to the record before each
+    missing record i, NaN where that previous value is NaN. Only the gaps are
+    summed, with the same groupby cumsum as a full-length pandas version.
+    """
+    mask = np.zeros(len(values), dtype=bool)
+    mask[i] = mask[last[i]] = True
+    rows = np.flatnonzero(mask)
+    total = pd.Series(values[rows]).groupby(last[rows]).cumsum().to_numpy()
+    return total[np.searchsorted(rows, i - 1)]
+
+
+def _to_timedelta(seconds):
+    """
+    Convert float seconds to timedelta64[ns], rounding the same way as
+    pd.to_timedelta(unit='s') without its per-element overhead
+    """
+    base = seconds.astype('int64')
+    frac = np.round(seconds - base, 9)
+    return (base*1000000000 + (frac*1e9).astype('int64')).view('m8[ns]')
+
+
+def _interpolate_inside(values, groups):
+    """
+    Linearly interpolate NaN values that lie between valid values of the same
+    group, equivalent to a groupby interpolate with limit_area='inside'
+    """
+    order = np.argsort(groups, kind='stable')
+    v, g = values[order], groups[order]
+    valid = ~np.isnan(v)
+    n = len(v)
+
+    prev = _last_valid(valid)
+    following = np.minimum.accumulate(np.where(valid, np.arange(n), n)[::-1])[::-1]
+    i = np.flatnonzero(~valid & (prev >= 0) & (following < n))
+    i = i[(g[prev[i]] == g[i]) & (g[following[i]] == g[i])]
+    v[i] = np.interp(i, np.flatnonzero(valid), v[valid])
+
+    values = values.copy()
+    values[order] = v
+    return values
 
 
 def read_ndc(file):
@@ -185,24 +284,32 @@ def read_ndc(file):
     Function to read electrochemical data from a Neware ndc binary file.
 
     Args:
-        file (str): Name of an .ndc file to read
+        file (str or bytes): Name of an .ndc file to read, or its contents,
+            e.g. as read from an ndax archive
     Returns:
         df (pd.DataFrame): DataFrame containing all records in the file
         aux_df (pd.DataFrame): DataFrame containing any temperature data
     """
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return _read_ndc(file)
+
     with open(file, 'rb') as f:
         mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _madvise(mm)
+        return _read_ndc(mm)
 
-        # Get ndc file version and filetype
-        [ndc_filetype] = struct.unpack('<B', mm[0:1])
-        [ndc_version] = struct.unpack('<B', mm[2:3])
-        logger.debug(f"NDC version: {ndc_version} filetype: {ndc_filetype}")
 
-        try:
-            f = getattr(sys.modules[__name__], f"_read_ndc_{ndc_version}_filetype_{ndc_filetype}")
-            return f(mm)
-        except AttributeError:
-            raise NotImplementedError(f"ndc version {ndc_version} filetype {ndc_filetype} is not yet supported!")
+def _read_ndc(mm):
+    """Dispatch ndc file contents to the reader for their version and filetype"""
+    # Get ndc file version and filetype
+    [ndc_filetype] = struct.unpack('<B', mm[0:1])
+    [ndc_version] = struct.unpack('<B', mm[2:3])
+    logger.debug(f"NDC version: {ndc_version} filetype: {ndc_filetype}")
+
+    f = _ndc_readers.get((ndc_version, ndc_filetype))
+    if f is None:
+        raise NotImplementedError(f"ndc version {ndc_version} filetype {ndc_filetype} is not yet supported!")
+    return f(mm)
 
 
 def _read_ndc_2_filetype_1(mm):
@@ -210,93 +317,60 @@ def _read_ndc_2_filetype_1(mm):
     identifier = mm[517:525]
 
     # Read data records
-    output = []
-    header = mm.find(identifier)
-    while header != -1:
-        mm.seek(header)
-        bytes = mm.read(record_len)
-        if bytes[0:1] == b'\x55':
-            output.append(_bytes_to_list_ndc(bytes))
-        else:
-            logger.warning("Unknown record type: "+bytes[0:1].hex())
-
-        header = mm.find(identifier, header + record_len)
-
-    # Postprocessing
-    df = pd.DataFrame(output, columns=rec_columns)
+    buf = np.frombuffer(mm, dtype=np.uint8)
+    header = _find_records(buf, identifier, record_len)
+    header = header[header + _ndc_dtype.itemsize <= len(buf)]
+    is_data = buf[header] == 0x55
+    for tag in buf[header[~is_data]].tolist():
+        logger.warning(f"Unknown record type: {tag:02x}")
 
-    return df
+    return _records_to_df(_records_at(buf, header[is_data], _ndc_dtype))
 
 
 def _read_ndc_2_filetype_5(mm):
     record_len = 94
     identifier = mm[517:525]
 
-    # Read aux records
-    aux = []
-    header = mm.find(identifier)
-    while header != -1:
-        mm.seek(header)
-        bytes = mm.read(record_len)
-        if bytes[0:1] == b'\x65':
-            aux.append(_aux_bytes_65_to_list_ndc(bytes))
-        elif bytes[0:1] == b'\x74':
-            aux.append(_aux_bytes_74_to_list_ndc(bytes))
-        else:
-            logger.warning("Unknown record type: "+bytes[0:1].hex())
-
-        header = mm.find(identifier, header + record_len)
+    # Read aux records. All records start with the identifier, so they share its type.
+    buf = np.frombuffer(mm, dtype=np.uint8)
+    header = _find_records(buf, identifier, record_len)
+    header = header[header + _ndc_aux_dtype.itemsize <= len(buf)]
+    aux = _records_at(buf, header, _ndc_aux_dtype)
 
     # Postprocessing
     aux_df = pd.DataFrame([])
-    if identifier[0:1] == b'\x65':
-        aux_df = pd.DataFrame(aux, columns=['Index', 'Aux', 'V', 'T'])
-    elif identifier[0:1] == b'\x74':
-        aux_df = pd.DataFrame(aux, columns=['Index', 'Aux', 'V', 'T', 't'])
+    if identifier[0] == 0x65:
+        aux_df = _aux_records_to_df_ndc(aux)
+    elif identifier[0] == 0x74:
+        aux_df = _aux_records_to_df_ndc(aux, t=True)
+    else:
+        for _ in range(len(header)):
+            logger.warning(f"Unknown record type: {identifier[0]:02x}")
 
     return aux_df
 
 
 def _read_ndc_5_filetype_1(mm):
-    mm_size = mm.size()
-    record_len = 4096
-    header = 4096
+    # Each 4096 byte page holds 45 records of 87 bytes
+    rows = _pages(mm)[:, 125:-56].reshape(-1, 87)
 
     # Read data records
-    output = []
-    mm.seek(header)
-    while mm.tell() < mm_size:
-        bytes = mm.read(record_len)
-        for i in struct.iter_unpack('<87s', bytes[125:-56]):
-            if i[0][7:8] == b'\x55':
-                output.append(_bytes_to_list_ndc(i[0]))
-
-    # Postprocessing
-    df = pd.DataFrame(output, columns=rec_columns)
-
-    return df
+    rows = rows[rows[:, 7] == 0x55, :_ndc_dtype.itemsize]
+    return _records_to_df(np.ascontiguousarray(rows).view(_ndc_dtype)[:, 0])
 
 
 def _read_ndc_5_filetype_5(mm):
-    mm_size = mm.size()
-    record_len = 4096
-    header = 4096
+    # Each 4096 byte page holds 45 records of 87 bytes
+    rows = _pages(mm)[:, 125:-56].reshape(-1, 87)
 
     # Read aux records
-    aux65 = []
-    aux74 = []
-    mm.seek(header)
-    while mm.tell() < mm_size:
-        bytes = mm.read(record_len)
-        for i in struct.iter_unpack('<87s', bytes[125:-56]):
-            if i[0][7:8] == b'\x65':
-                aux65.append(_aux_bytes_65_to_list_ndc(i[0]))
-            elif i[0][7:8] == b'\x74':
-                aux74.append(_aux_bytes_74_to_list_ndc(i[0]))
+    aux = np.ascontiguousarray(rows[:, :_ndc_aux_dtype.itemsize]).view(_ndc_aux_dtype)[:, 0]
+    aux65 = aux[rows[:, 7] == 0x65]
+    aux74 = aux[rows[:, 7] == 0x74]
 
     # Concat aux65 and aux74 if they both contain data
-    aux_df = pd.DataFrame(aux65, columns=['Index', 'Aux', 'V', 'T'])
-    aux74_df = pd.DataFrame(aux74, columns=['Index', 'Aux', 'V', 'T', 't'])
+    aux_df = _aux_records_to_df_ndc(aux65)
+    aux74_df = _aux_records_to_df_ndc(aux74, t=True)
     if (not aux_df.empty) & (not aux74_df.empty):
         aux_df = pd.concat([aux_df, aux74_df.drop(columns=['t'])])
     elif (not aux74_df.empty):
@@ -306,149 +380,78 @@ def _read_ndc_5_filetype_5(mm):
 
 
 def _read_ndc_11_filetype_1(mm):
-    mm_size = mm.size()
-    record_len = 4096
-    header = 4096
-
     # Read data records
-    rec = []
-    mm.seek(header)
-    while mm.tell() < mm_size:
-        bytes = mm.read(record_len)
-        for i in struct.iter_unpack('<ff', bytes[132:-4]):
-            if (i[0] != 0):
-                rec.append([1e-4*i[0], i[1]])
+    rec = _float_records(mm, 2)
+    rec = rec[rec[:, 0] != 0]
 
     # Create DataFrame
-    df = pd.DataFrame(rec, columns=['Voltage', 'Current(mA)'])
+    df = pd.DataFrame({'Voltage': 1e-4*rec[:, 0], 'Current(mA)': rec[:, 1]})
     df['Index'] = df.index + 1
     return df
 
 
 def _read_ndc_11_filetype_5(mm):
-    mm_size = mm.size()
-    record_len = 4096
     header = 4096
 
-    # Read data records
-    aux = []
-    mm.seek(header)
-
-    if mm[header+132:header+133] == b'\x65':
-        while mm.tell() < mm_size:
-            bytes = mm.read(record_len)
-            for i in struct.iter_unpack('<cfh', bytes[132:-2]):
-                if i[0] == b'\x65':
-                    aux.append([i[1]/10000, i[2]/10])
+    if mm[header+132] == 0x65:
+        aux = _page_records(mm, _ndc_11_aux_65_dtype, end=-2)
+        aux = aux[aux['tag'] == 0x65]
 
         # Create DataFrame
-        aux_df = pd.DataFrame(aux, columns=['V', 'T'])
+        aux_df = pd.DataFrame({'V': aux['V'].astype('float64')/10000, 'T': aux['T']/10})
         aux_df['Index'] = aux_df.index + 1
 
-    elif mm[header+132:header+133] == b'\x74':
-        while mm.tell() < mm_size:
-            bytes = mm.read(record_len)
-            for i in struct.iter_unpack('<cib29sh51s', bytes[132:-4]):
-                if i[0] == b'\x74':
-                    aux.append([i[1], i[2], i[4]/10])
+    elif mm[header+132] == 0x74:
+        aux = _page_records(mm, _ndc_11_aux_74_dtype)
+        aux = aux[aux['tag'] == 0x74]
 
         # Create DataFrame
-        aux_df = pd.DataFrame(aux, columns=['Index', 'Aux', 'T'])
+        aux_df = pd.DataFrame({'Index': aux['Index'], 'Aux': aux['Aux'], 'T': aux['T']/10})
 
     return aux_df
 
 
 def _read_ndc_11_filetype_7(mm):
-    mm_size = mm.size()
-    record_len = 4096
-    header = 4096
-
     # Read data records
-    rec = []
-    mm.seek(header)
-    while mm.tell() < mm_size:
-        bytes = mm.read(record_len)
-        for i in struct.iter_unpack('<ii16sb12s', bytes[132:-5]):
-            [Cycle, Step_Index, Status] = [i[0], i[1], i[3]]
-            if Step_Index != 0:
-                rec.append([Cycle+1, Step_Index, state_dict[Status]])
+    rec = _page_records(mm, _ndc_step_dtype, end=-5)
+    rec = rec[rec['Step_Index'] != 0]
 
     # Create DataFrame
-    df = pd.DataFrame(rec, columns=['Cycle', 'Step_Index', 'Status'])
+    df = pd.DataFrame({
+        'Cycle': rec['Cycle'].astype('int64') + 1,
+        'Step_Index': rec['Step_Index'].astype('int64'),
+        'Status': _lookup(state_dict, rec['Status'])})
     df['Step'] = df.index + 1
     return df
 
 
 def _read_ndc_11_filetype_18(mm):
-    mm_size = mm.size()
-    record_len = 4096
-    header = 4096
-
     # Read data records
-    rec = []
-    mm.seek(header)
-    while mm.tell() < mm_size:
-        bytes = mm.read(record_len)
-        for i in struct.iter_unpack('<isffff12siii2s', bytes[132:-63]):
-            Time = i[0]
-            [Charge_Capacity, Discharge_Capacity] = [i[2], i[3]]
-            [Charge_Energy, Discharge_Energy] = [i[4], i[5]]
-            [Timestamp, Step, Index] = [i[7], i[8], i[9]]
-            if Index != 0:
-                rec.append([Time/1000,
-                            Charge_Capacity/3600, Discharge_Capacity/3600,
-                            Charge_Energy/3600, Discharge_Energy/3600,
-                            datetime.fromtimestamp(Timestamp, timezone.utc), Step, Index])
+    rec = _page_records(mm, _ndc_runinfo_dtype(47), end=-63)
+    rec = rec[rec['Index'] != 0]
 
     # Create DataFrame
-    df = pd.DataFrame(rec, columns=[
-        'Time',
-        'Charge_Capacity(mAh)', 'Discharge_Capacity(mAh)',
-        'Charge_Energy(mWh)', 'Discharge_Energy(mWh)',
-        'Timestamp', 'Step', 'Index']).astype({'Time': 'float'})
-    df['Step'] = _count_changes(df['Step'])
-
-    # Convert timestamp to local timezone
-    tz = datetime.now().astimezone().tzinfo
-    df['Timestamp'] = df['Timestamp'].dt.tz_convert(tz)
-
+    df = _runinfo_records_to_df(rec, 1/3600)
     return df
 
 
 def _read_ndc_14_filetype_1(mm):
-    mm_size = mm.size()
-    record_len = 4096
-    header = 4096
-
     # Read data records
-    rec = []
-    mm.seek(header)
-    while mm.tell() < mm_size:
-        bytes = mm.read(record_len)
-        for i in struct.iter_unpack('<ff', bytes[132:-4]):
-            if (i[0] != 0):
-                rec.append([i[0], 1000*i[1]])
+    rec = _float_records(mm, 2)
+    rec = rec[rec[:, 0] != 0]
 
     # Create DataFrame
-    df = pd.DataFrame(rec, columns=['Voltage', 'Current(mA)'])
+    df = pd.DataFrame({'Voltage': rec[:, 0], 'Current(mA)': 1000*rec[:, 1]})
     df['Index'] = df.index + 1
     return df
 
 
 def _read_ndc_14_filetype_5(mm):
-    record_len = 4096
-    header = 4096
-
     # Read data records
-    aux = []
-    mm.seek(header)
-    while mm.tell() < mm.size():
-        bytes = mm.read(record_len)
-        for i in struct.iter_unpack('<f', bytes[132:-4]):
-            aux.append(i[0])
+    aux = _page_records(mm, '<f4')
 
     # Create DataFrame
-    aux_df = pd.DataFrame(aux, columns=['T'])
+    aux_df = pd.DataFrame({'T': aux.astype('float64')})
     aux_df['Index'] = aux_df.index + 1
 
     return aux_df
@@ -459,32 +462,43 @@ def _read_ndc_14_filetype_7(mm):
 
 
 def _read_ndc_14_filetype_18(mm):
-    mm_size = mm.size()
-    record_len = 4096
-    header = 4096
-
     # Read data records
-    rec = []
-    mm.seek(header)
-    while mm.tell() < mm_size:
-        bytes = mm.read(record_len)
-        for i in struct.iter_unpack('<isffff12siii10s', bytes[132:-59]):
-            Time = i[0]
-            [Charge_Capacity, Discharge_Capacity] = [i[2], i[3]]
-            [Charge_Energy, Discharge_Energy] = [i[4], i[5]]
-            [Timestamp, Step, Index] = [i[7], i[8], i[9]]
-            if Index != 0:
-                rec.append([Time/1000,
-                            Charge_Capacity*1000, Discharge_Capacity*1000,
-                            Charge_Energy*1000, Discharge_Energy*1000,
-                            datetime.fromtimestamp(Timestamp, timezone.utc), Step, Index])
+    rec = _page_records(mm, _ndc_runinfo_dtype(55), end=-59)
+    rec = rec[rec['Index'] != 0]
 
     # Create DataFrame
-    df = pd.DataFrame(rec, columns=[
-        'Time',
-        'Charge_Capacity(mAh)', 'Discharge_Capacity(mAh)',
-        'Charge_Energy(mWh)', 'Discharge_Energy(mWh)',
-        'Timestamp', 'Step', 'Index']).astype({'Time': 'float'})
+    df = _runinfo_records_to_df(rec, 1000)
+    return df
+
+
+# ndc readers by (version, filetype)
+_ndc_readers = {
+    (2, 1): _read_ndc_2_filetype_1,
+    (2, 5): _read_ndc_2_filetype_5,
+    (5, 1): _read_ndc_5_filetype_1,
+    (5, 5): _read_ndc_5_filetype_5,
+    (11, 1): _read_ndc_11_filetype_1,
+    (11, 5): _read_ndc_11_filetype_5,
+    (11, 7): _read_ndc_11_filetype_7,
+    (11, 18): _read_ndc_11_filetype_18,
+    (14, 1): _read_ndc_14_filetype_1,
+    (14, 5): _read_ndc_14_filetype_5,
+    (14, 7): _read_ndc_14_filetype_7,
+    (14, 18): _read_ndc_14_filetype_18,
+}
+
+
+def _runinfo_records_to_df(rec, scale):
+    """Helper function for interpreting ndc runInfo records"""
+    df = pd.DataFrame({
+        'Time': rec['Time']/1000,
+        'Charge_Capacity(mAh)': rec['Charge_Capacity'].astype('float64')*scale,
+        'Discharge_Capacity(mAh)': rec['Discharge_Capacity'].astype('float64')*scale,
+        'Charge_Energy(mWh)': rec['Charge_Energy'].astype('float64')*scale,
+        'Discharge_Energy(mWh)': rec['Discharge_Energy'].astype('float64')*scale,
+        'Timestamp': pd.to_datetime(rec['Timestamp'], unit='s', utc=True),
+        'Step': rec['Step'].astype('int64'),
+        'Index': rec['Index'].astype('int64')})
     df['Step'] = _count_changes(df['Step'])
 
     # Convert timestamp to local timezone
@@ -494,52 +508,121 @@ def _read_ndc_14_filetype_18(mm):
     return df
 
 
-def _bytes_to_list_ndc(bytes):
-    """Helper function for interpreting an ndc byte string"""
-
-    # Extract fields from byte string
-    [Index, Cycle, Step, Status] = struct.unpack('<IIBB', bytes[8:18])
-    [Time, Voltage, Current] = struct.unpack('<Qii', bytes[23:39])
-    [Charge_capacity, Discharge_capacity,
-     Charge_energy, Discharge_energy] = struct.unpack('<qqqq', bytes[43:75])
-    [Y, M, D, h, m, s] = struct.unpack('<HBBBBB', bytes[75:82])
-    [Range] = struct.unpack('<i', bytes[82:86])
-
-    multiplier = multiplier_dict[Range]
-
-    # Create a record
-    list = [
-        Index,
-        Cycle + 1,
-        Step,
-        state_dict[Status],
-        Time/1000,
-        Voltage/10000,
-        Current*multiplier,
-        Charge_capacity*multiplier/3600,
-        Discharge_capacity*multiplier/3600,
-        Charge_energy*multiplier/3600,
-        Discharge_energy*multiplier/3600,
-        datetime(Y, M, D, h, m, s)
-    ]
-    return list
-
-
-def _aux_bytes_65_to_list_ndc(bytes):
-    """Helper function for intepreting auxiliary records"""
-    [Aux] = struct.unpack('<B', bytes[3:4])
-    [Index] = struct.unpack('<I', bytes[8:12])
-    [T] = struct.unpack('<h', bytes[41:43])
-    [V] = struct.unpack('<i', bytes[31:35])
-
-    return [Index, Aux, V/10000, T/10]
-
-
-def _aux_bytes_74_to_list_ndc(bytes):
-    """Helper function for intepreting auxiliary records"""
-    [Aux] = struct.unpack('<B', bytes[3:4])
-    [Index] = struct.unpack('<I', bytes[8:12])
-    [V] = struct.unpack('<i', bytes[31:35])
-    [T, t] = struct.unpack('<hh', bytes[41:45])
-
-    return [Index, Aux, V/10000, T/10, t/10]
+# Record layout for ndc data records
+_ndc_dtype = np.dtype({
+    'names': ['Index', 'Cycle', 'Step', 'Status', 'Time', 'Voltage', 'Current',
+              'Charge_Capacity', 'Discharge_Capacity', 'Charge_Energy',
+              'Discharge_Energy', 'Y', 'M', 'D', 'h', 'm', 's', 'Range'],
+    'formats': ['<u4', '<u4', 'u1', 'u1', '<u8', '<i4', '<i4',
+                '<i8', '<i8', '<i8',
+                '<i8', '<u2', 'u1', 'u1', 'u1', 'u1', 'u1', '<i4'],
+    'offsets': [8, 12, 16, 17, 23, 31, 35,
+                43, 51, 59,
+                67, 75, 77, 78, 79, 80, 81, 82],
+    'itemsize': 86})
+
+
+# Layout of ndc auxiliary records. The t field only exists in b'\x74' records.
+_ndc_aux_dtype = np.dtype({
+    'names': ['Aux', 'Index', 'V', 'T', 't'],
+    'formats': ['u1', '<u4', '<i4', '<i2', '<i2'],
+    'offsets': [3, 8, 31, 41, 43],
+    'itemsize': 45})
+
+
+# Layouts of the records stored in the pages of ndc version 11 and 14 files
+_ndc_11_aux_65_dtype = np.dtype({
+    'names': ['tag', 'V', 'T'],
+    'formats': ['u1', '<f4', '<i2'],
+    'offsets': [0, 1, 5],
+    'itemsize': 7})
+
+_ndc_11_aux_74_dtype = np.dtype({
+    'names': ['tag', 'Index', 'Aux', 'T'],
+    'formats': ['u1', '<i4', 'i1', '<i2'],
+    'offsets': [0, 1, 5, 35],
+    'itemsize': 88})
+
+_ndc_step_dtype = np.dtype({
+    'names': ['Cycle', 'Step_Index', 'Status'],
+    'formats': ['<i4', '<i4', 'i1'],
+    'offsets': [0, 4, 24],
+    'itemsize': 37})
+
+
+def _ndc_runinfo_dtype(itemsize):
+    """Layout of ndc runInfo records, which differ only in padding by version"""
+    return np.dtype({
+        'names': ['Time', 'Charge_Capacity', 'Discharge_Capacity', 'Charge_Energy',
+                  'Discharge_Energy', 'Timestamp', 'Step', 'Index'],
+        'formats': ['<i4', '<f4', '<f4', '<f4', '<f4', '<i4', '<i4', '<i4'],
+        'offsets': [0, 5, 9, 13, 17, 33, 37, 41],
+        'itemsize': itemsize})
+
+
+def _aux_records_to_df_ndc(rec, t=False):
+    """Helper function for interpreting ndc auxiliary records"""
+    aux_df = pd.DataFrame({
+        'Index': rec['Index'],
+        'Aux': rec['Aux'],
+        'V': rec['V']/10000,
+        'T': rec['T']/10
+    })
+    if t:
+        aux_df['t'] = rec['t']/10
+    return aux_df
+
+
+def _pages(mm, page_len=4096):
+    """View the pages after the ndc header as rows of a 2D byte array"""
+    n = max(len(mm) // page_len - 1, 0)
+    return np.frombuffer(mm, dtype=np.uint8, count=n*page_len,
+                         offset=page_len).reshape(n, page_len)
+
+
+def _page_records(mm, dtype, start=132, end=-4):
+    """
+    View the records stored in bytes start:end of each page as a 1D array of
+    the given dtype
+    """
+    return np.ascontiguousarray(_pages(mm)[:, start:end]).view(dtype).reshape(-1)
+
+
+def _float_records(mm, n_fields):
+    """
+    Read the float32 records stored in bytes 132:-4 of each page into a float64
+    array with one row per record
+    """
+    return _page_records(mm, '<f4').reshape(-1, n_fields).astype('float64')
+
+
+def _records_at(buf, offsets, dtype):
+    """
+    Copy the records of the given dtype that start at byte offsets of buf,
+    gathered through a view with a record starting at every byte
+    """
+    n = max(len(buf) - dtype.itemsize + 1, 0)
+    view = np.ndarray((n,), dtype=dtype, buffer=buf, strides=(1,))
+    return view[offsets]
+
+
+def _find_records(buf, identifier, record_len):
+    """
+    Locate records starting with identifier the same way as repeated calls to
+    mm.find(identifier, header + record_len), i.e. ignoring matches that fall
+    inside a previous record.
+    """
+    identifier = np.frombuffer(identifier, dtype=np.uint8)
+    header = np.flatnonzero(buf[:len(buf) - len(identifier) + 1] == identifier[0])
+    for i, b in enumerate(identifier[1:], 1):
+        header = header[buf[header + i] == b]
+
+    if (np.diff(header) < record_len).any():
+        keep = []
+        following = 0
+        for h in header.tolist():
+            if h >= following:
+                keep.append(h)
+                following = h + record_len
+        header = np.array(keep, dtype=np.intp)
+    return header
@@ -8,6 +8,25 @@ import pandas as pd
 import NewareNDA
 
 
+def _to_csv_pyarrow(df, f, workers):
+    """Write csv with the multithreaded pyarrow writer"""
+    import pyarrow as pa
+    import pyarrow.csv
+    pa.set_cpu_count(workers)
+    pyarrow.csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), f)
+
+
+def _positive_int(value):
+    """argparse type for a strictly positive integer"""
+    try:
+        n = int(value)
+    except ValueError:
+        n = 0
+    if n <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return n
+
+
 def main():
     output_cmd = {
         'csv': lambda df, f: pd.DataFrame.to_csv(df, f, index=False),
@@ -33,8 +52,21 @@ def main():
                         help='Set the logging level for NewareNDA')
     parser.add_argument('-c', '--cycle_mode', choices=['chg', 'dchg', 'auto'], default='chg',
                         help='Selects how the cycle is incremented.')
+    parser.add_argument('-w', '--workers', type=_positive_int,
+                        help='Write csv with pyarrow using this many threads. Only valid with '
+                        'the csv format. The pyarrow writer quotes strings and writes '
+                        'Timestamp in UTC with a "Z" suffix.')
     args = parser.parse_args()
 
+    if args.workers is not None:
+        if args.format != 'csv':
+            parser.error('--workers is only supported with --format=csv')
+        try:
+            import pyarrow.csv  # noqa: F401
+        except ImportError:
+            parser.error('--workers requires pyarrow to be installed')
+        output_cmd['csv'] = lambda df, f: _to_csv_pyarrow(df, f, args.workers)
+
     df = NewareNDA.read(args.in_file, args.no_software_cycle_number, cycle_mode=args.cycle_mode, log_level=args.log_level)
     output_cmd[args.format](df, args.out_file)
 
@@ -1,7 +1,19 @@
+import os
+import mmap
 import logging
+from datetime import datetime
+from dateutil import tz
+import numpy as np
+import pandas as pd
+
+from .dicts import multiplier_dict, state_dict
 
 logger = logging.getLogger('newarenda')
 
+# Sorted Range settings and their multipliers for vectorized lookups
+_range_keys = np.array(sorted(multiplier_dict), dtype='int32')
+_range_multipliers = np.array([multiplier_dict[k] for k in _range_keys.tolist()])
+
 
 def _generate_cycle_number(df, cycle_mode='chg'):
     """
@@ -27,58 +39,46 @@ def _generate_cycle_number(df, cycle_mode='chg'):
         logger.error(f"Cycle_Mode '{cycle_mode}' not recognized. Supported options are 'chg', 'dchg', and 'auto'.")
         raise KeyError(f"Cycle_Mode '{cycle_mode}' not recognized. Supported options are 'chg', 'dchg', and 'auto'.")
 
-    # Identify the beginning of key incremental steps
-    inc = (df['Status'] == 'CCCV_'+inkey) | (df['Status'] == 'CC_'+inkey) | (df['Status'] == 'CP_'+inkey)
-
-    # inc series = 1 at new incremental step, 0 otherwise
-    inc = (inc - inc.shift()).clip(0)
-    inc.iat[0] = 1
+    # Classify each Status category once as incremental and/or off state (incl. SIM).
+    # The trailing False is selected by the code -1 of missing values.
+    status = df['Status'].astype('category')
+    codes, uniques = status.cat.codes.to_numpy(), status.cat.categories
+    inc_states = {'CCCV_'+inkey, 'CC_'+inkey, 'CP_'+inkey}
+    inc = np.array([s in inc_states for s in uniques] + [False], dtype=bool)[codes]
+    flag = np.array([s == 'SIM' or ('_' in s and s.split('_', 1)[1] == offkey)
+                     for s in uniques] + [False], dtype=bool)[codes]
 
-    # Convert to numpy arrays
-    inc = inc.values
-    status = df['Status'].values
+    # Beginning of key incremental steps, excluding the first record
+    starts = np.flatnonzero(inc[1:] & ~inc[:-1]) + 1
 
-    # Increment the cycle at a charge step after there has been a discharge, or vice versa
-    cyc = 1
-    Flag = False
-    for n in range(len(inc)):
-        # Get Chg/DChg status
-        try:
-            method, state = status[n].split('_', 1)
-        except ValueError:
-            # Status is SIM or otherwise. Set Flag
-            Flag = True if status[n] == 'SIM' else Flag
+    # Increment the cycle at a charge step after there has been a discharge, or vice versa.
+    # The flag is cleared at every incremental step, so an incremental step starts
+    # a new cycle if any flag was set since the previous incremental step.
+    n_flag = flag.cumsum()
+    new_cycle = np.diff(n_flag[starts], prepend=0) > 0
 
-        else:
-            # Standard status type
-            if inc[n] & Flag:
-                # Increment the cycle number and reset flag when flag is active and the incremental step changes
-                cyc += 1
-                Flag = False
-            elif state == offkey:
-                Flag = True
-
-        finally:
-            inc[n] = cyc
-
-    return inc
+    cyc = np.zeros(len(inc), dtype=np.uint16)
+    cyc[starts[new_cycle]] = 1
+    return cyc.cumsum(dtype=np.uint16) + 1
 
 
 def _count_changes(series):
     """Enumerate the number of value changes in a series"""
-    a = series.diff()
-    a.iloc[0] = 1
-    a.iloc[-1] = 0
-    return (abs(a) > 0).cumsum()
+    a = series.to_numpy()
+    changes = np.empty(len(a), dtype=bool)
+    np.not_equal(a[1:], a[:-1], out=changes[1:])
+    changes[:1] = True
+    changes[-1:] = False
+    return changes.cumsum(dtype=np.uint32)
 
 
 def _id_first_state(df):
     """Helper function to identify the first non-rest state in a cycling profile"""
-    nonrest_states = df[df['Status'] != 'Rest']['Status']
+    nonrest = (df['Status'] != 'Rest').to_numpy()
 
     # If no non-rest cycles exist, just pick a mode; it doesn't matter.
-    if len(nonrest_states) > 0:
-        first_state = nonrest_states.iat[0]
+    if nonrest.any():
+        first_state = df['Status'].array[nonrest.argmax()]
     else:
         return 'chg'
 
@@ -90,3 +90,140 @@ def _id_first_state(df):
         cycle_mode = 'chg'
 
     return cycle_mode.lower()
+
+
+def _lookup(d, keys):
+    """
+    Map an array of keys through a dictionary into a Categorical, one lookup
+    per unique key. Categories are the sorted values that occur.
+    """
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    categories, codes = np.unique(
+        np.array([d[k] for k in uniques.tolist()], dtype=object), return_inverse=True)
+    return pd.Categorical.from_codes(codes[inverse], categories)
+
+
+def _multiplier(Range):
+    """Look up the field scaling for an array of instrument Range settings"""
+    idx = np.searchsorted(_range_keys, Range).clip(max=len(_range_keys) - 1)
+    missing = _range_keys[idx] != Range
+    if missing.any():
+        raise KeyError(Range[missing][0].item())
+    return _range_multipliers[idx]
+
+
+def _madvise(mm):
+    """Hint to the OS that a memory map will be read sequentially and in full"""
+    try:
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+        mm.madvise(mmap.MADV_WILLNEED)
+    except (AttributeError, OSError):
+        # madvise is not available on all platforms
+        pass
+
+
+def _local_tz():
+    """
+    Local timezone by name, so that each record gets the UTC offset in force
+    at its own time and the timezone survives export to feather and parquet.
+    Falls back to the current fixed offset when the zone has no name.
+    """
+    name = os.environ.get('TZ', '').lstrip(':')
+    if not name and os.path.islink('/etc/localtime'):
+        name = os.path.realpath('/etc/localtime')
+    if name.startswith('/'):
+        name = name.partition('zoneinfo/')[2]
+    zone = tz.gettz(name) if name else None
+    if isinstance(zone, tz.tzfile):
+        return zone
+    return datetime.now().astimezone().tzinfo
+
+
+def _join_aux(df, aux_df):
+    """
+    Join auxiliary data to df with one column per field and aux channel,
+    e.g. 'T1', 'V1'. Rows of df are matched to aux records by 'Index'.
+    """
+    index = df['Index'].to_numpy()
+    fields = [c for c in aux_df.columns if c not in ('Index', 'Aux')]
+
+    # Locate the aux record of each row of df, for each aux channel
+    aux = aux_df['Aux'].to_numpy()
+    rows = {}
+    for a in np.unique(aux):
+        sub = aux_df[aux == a]
+        idx = sub['Index'].to_numpy()
+        order = np.argsort(idx, kind='stable')
+        pos = np.searchsorted(idx, index, side='right', sorter=order) - 1
+        found = pos >= 0
+        found[found] = idx[order[pos[found]]] == index[found]
+        rows[a] = (sub, order[pos[found]], found)
+
+    columns = {}
+    for field in fields:
+        for a, (sub, pos, found) in rows.items():
+            values = sub[field].to_numpy()
+            col = np.full(len(index), np.nan, dtype=np.result_type(values, np.float32))
+            col[found] = values[pos]
+            columns[f"{field}{a}"] = col
+    return df.assign(**columns)
+
+
+def _set_dtypes(df, dtypes):
+    """
+    Cast the columns of df in place to the given dtypes. Columns that already
+    have the right dtype are left alone rather than copied as by df.astype().
+    """
+    for column, dtype in dtypes.items():
+        if df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+
+
+# Number of records scaled per block in _records_to_df
+_chunk_size = 8192
+
+
+def _records_to_df(rec):
+    """Helper function for interpreting nda version 29 and ndc data records"""
+    # Output columns are allocated in their final dtype. Scaling is computed
+    # in float64 and rounded once when written.
+    n = len(rec)
+    Time, Voltage, Current = [np.empty(n, dtype=np.float32) for _ in range(3)]
+    Charge_Capacity, Discharge_Capacity, Charge_Energy, Discharge_Energy = \
+        [np.empty(n, dtype=np.float32) for _ in range(4)]
+
+    # Scale the strided record fields in blocks that stay in cache
+    scratch = np.empty(min(n, _chunk_size), dtype=np.float64)
+    for start in range(0, n, _chunk_size):
+        chunk = rec[start:start + _chunk_size]
+        stop = start + len(chunk)
+        multiplier = _multiplier(chunk['Range'])
+        product = scratch[:len(chunk)]
+
+        np.divide(chunk['Time'], 1000, out=Time[start:stop])
+        np.divide(chunk['Voltage'], 10000, out=Voltage[start:stop])
+        np.multiply(chunk['Current'], multiplier, out=Current[start:stop])
+        for field, out in [('Charge_Capacity', Charge_Capacity),
+                           ('Discharge_Capacity', Discharge_Capacity),
+                           ('Charge_Energy', Charge_Energy),
+                           ('Discharge_Energy', Discharge_Energy)]:
+            np.multiply(chunk[field], multiplier, out=product)
+            np.divide(product, 3600, out=out[start:stop])
+
+    df = pd.DataFrame({
+        'Index': rec['Index'],
+        'Cycle': rec['Cycle'] + 1,
+        'Step': rec['Step'],
+        'Status': _lookup(state_dict, rec['Status']),
+        'Time': Time,
+        'Voltage': Voltage,
+        'Current(mA)': Current,
+        'Charge_Capacity(mAh)': Charge_Capacity,
+        'Discharge_Capacity(mAh)': Discharge_Capacity,
+        'Charge_Energy(mWh)': Charge_Energy,
+        'Discharge_Energy(mWh)': Discharge_Energy,
+        'Timestamp': pd.to_datetime({
+            'year': rec['Y'], 'month': rec['M'], 'day': rec['D'],
+            'hour': rec['h'], 'minute': rec['m'], 'second': rec['s']})
+    })
+    return df
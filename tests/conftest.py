@@ -29,13 +29,17 @@ def pytest_addoption(parser):
 
 
 def pytest_generate_tests(metafunc):
+    # Only the regression tests are run once per file
+    if 'ref_file' not in metafunc.fixturenames:
+        return
+
     nda_dir = metafunc.config.getoption('--ndaDir')
     ref_dir = metafunc.config.getoption('--refDir')
     software_cycle_number = metafunc.config.getoption('--no_software_cycle_number')
     cycle_mode = metafunc.config.getoption('--cycle_mode')
 
     # Generate list of files to compare
-    nda_files = glob.glob(nda_dir + '/**/*.nda*', recursive=True)
+    nda_files = sorted(glob.glob(nda_dir + '/**/*.nda*', recursive=True))
     ref_files = [osp.join(ref_dir, f"{osp.splitext(osp.basename(f))[0]}.ftr")
                  for f in nda_files]
     cycle_modes = [cycle_mode for f in nda_files]
@@ -43,4 +47,5 @@ def pytest_generate_tests(metafunc):
 
     metafunc.parametrize(
         "nda_file, ref_file, software_cycle_number, cycle_mode",
-        list(zip(nda_files, ref_files, software_cycle_numbers, cycle_modes)))
+        list(zip(nda_files, ref_files, software_cycle_numbers, cycle_modes)),
+        ids=[osp.basename(f) for f in nda_files])
@@ -1,34 +1,160 @@
 import os
+import sys
+import time
 import tempfile
+import pytest
+import numpy as np
 import pandas as pd
 import NewareNDA
-from datetime import datetime
+from NewareNDA import NewareNDAx
+from NewareNDA.__main__ import main
+from NewareNDA.utils import _generate_cycle_number
+
+nda_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nda')
 
 
 def test_NewareNDA(nda_file, ref_file, software_cycle_number, cycle_mode):
     df = NewareNDA.read(nda_file, software_cycle_number, cycle_mode)
     ref_df = pd.read_feather(ref_file)
 
+    # Splitting signed fields must not produce negative zeros
+    for column in df.select_dtypes('float').columns:
+        values = df[column].to_numpy()
+        assert not (np.signbit(values) & (values == 0)).any(), column
+
+    # Status categories are the states present in the data
+    status = df['Status']
+    assert list(status.cat.categories) == sorted(status.dropna().unique())
+
     # Convert dates to timestamps for comparison
-    df['Timestamp'] = df['Timestamp'].apply(datetime.timestamp)
-    ref_df['Timestamp'] = ref_df['Timestamp'].apply(datetime.timestamp)
+    df['Timestamp'] = _timestamp(df['Timestamp'])
+    ref_df['Timestamp'] = _timestamp(ref_df['Timestamp'])
 
     pd.testing.assert_frame_equal(df, ref_df, check_like=True)
 
 
-def test_NewareNDAcli(nda_file, ref_file, software_cycle_number, cycle_mode):
+def test_NewareNDAcli(nda_file, ref_file, software_cycle_number, cycle_mode, monkeypatch):
     with tempfile.TemporaryDirectory() as tmpdir:
         filename = os.path.join(tmpdir, os.path.basename(nda_file))
-        os.system(
-            f"python -m NewareNDA --format=feather "
-            f"{'' if software_cycle_number else '--no_software_cycle_number'} "
-            f"--cycle_mode={cycle_mode} "
-            f"\"{nda_file}\" \"{filename}.ftr\"")
+        monkeypatch.setattr(sys, 'argv', [
+            'NewareNDA-cli', '--format=feather',
+            *([] if software_cycle_number else ['--no_software_cycle_number']),
+            f"--cycle_mode={cycle_mode}",
+            nda_file, f"{filename}.ftr"])
+        main()
         df = pd.read_feather(f"{filename}.ftr")
     ref_df = pd.read_feather(ref_file)
 
     # Convert dates to timestamps for comparison
-    df['Timestamp'] = df['Timestamp'].apply(datetime.timestamp)
-    ref_df['Timestamp'] = ref_df['Timestamp'].apply(datetime.timestamp)
+    df['Timestamp'] = _timestamp(df['Timestamp'])
+    ref_df['Timestamp'] = _timestamp(ref_df['Timestamp'])
 
     pd.testing.assert_frame_equal(df, ref_df, check_like=True)
+
+
+def test_NewareNDAcli_workers(monkeypatch):
+    pytest.importorskip('pyarrow')
+    nda_file = os.path.join(nda_dir, 'github', 'Issue72', 'TestFile.nda')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'TestFile.csv')
+        monkeypatch.setattr(sys, 'argv', [
+            'NewareNDA-cli', '--workers=2', nda_file, filename])
+        main()
+        df = pd.read_csv(filename)
+    ref_df = NewareNDA.read(nda_file)
+
+    # pyarrow writes Timestamp in UTC with a "Z" suffix
+    df['Timestamp'] = _timestamp(pd.to_datetime(df['Timestamp']))
+    ref_df['Timestamp'] = _timestamp(ref_df['Timestamp'])
+
+    pd.testing.assert_frame_equal(df, ref_df, check_dtype=False,
+                                  check_categorical=False)
+
+
+@pytest.mark.parametrize('args', [
+    ['--workers=2', '--format=feather'], ['--workers=0'], ['--workers=-1']])
+def test_NewareNDAcli_workers_invalid(args, monkeypatch):
+    nda_file = os.path.join(nda_dir, 'github', 'Issue72', 'TestFile.nda')
+    monkeypatch.setattr(sys, 'argv', ['NewareNDA-cli', *args, nda_file, 'out.csv'])
+    with pytest.raises(SystemExit):
+        main()
+
+
+def test_NewareNDAcli_workers_no_pyarrow(monkeypatch):
+    nda_file = os.path.join(nda_dir, 'github', 'Issue72', 'TestFile.nda')
+    monkeypatch.setitem(sys.modules, 'pyarrow', None)
+    monkeypatch.setitem(sys.modules, 'pyarrow.csv', None)
+    monkeypatch.setattr(sys, 'argv', ['NewareNDA-cli', '--workers=2', nda_file, 'out.csv'])
+    with pytest.raises(SystemExit):
+        main()
+
+
+@pytest.mark.skipif(not hasattr(time, 'tzset'), reason="requires time.tzset()")
+@pytest.mark.parametrize('nda_file', [
+    os.path.join(nda_dir, 'mediafire', '2-1-6_61[07005012].nda'),
+    os.path.join(nda_dir, 'github', 'Issue72', 'TestFile.nda')], ids=os.path.basename)
+def test_local_timezone(nda_file, monkeypatch):
+    # Each record must get the UTC offset in force at its own time
+    monkeypatch.setenv('TZ', 'Australia/Sydney')
+    time.tzset()
+    try:
+        df = NewareNDA.read(nda_file)
+        local = df['Timestamp'].dt.tz_convert('Australia/Sydney')
+        assert (df['Timestamp'].dt.tz_localize(None) == local.dt.tz_localize(None)).all()
+
+        # The timezone must be one that feather and parquet can store
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'out.ftr')
+            df.to_feather(filename)
+            pd.testing.assert_series_equal(
+                pd.read_feather(filename)['Timestamp'], local, check_dtype=False)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_ndax_unused_step_states(monkeypatch):
+    # States of steps without data must not appear as Status categories
+    read_ndc_members = NewareNDAx._read_ndc_members
+
+    def add_unused_step(zf, names):
+        ndc = read_ndc_members(zf, names)
+        step_df = ndc['data_step.ndc']
+        ndc['data_step.ndc'] = pd.DataFrame({
+            'Cycle': [*step_df['Cycle'], step_df['Cycle'].max()],
+            'Step_Index': [*step_df['Step_Index'], step_df['Step_Index'].max() + 1],
+            'Status': pd.Categorical([*step_df['Status'], 'CP_DChg']),
+            'Step': [*step_df['Step'], step_df['Step'].max() + 1]})
+        return ndc
+
+    monkeypatch.setattr(NewareNDAx, '_read_ndc_members', add_unused_step)
+    df = NewareNDA.read(os.path.join(
+        nda_dir, 'github', 'Issue60', 'BTS85-36-6-5-110-20240424.ndax'))
+    assert 'CP_DChg' not in df['Status'].unique()
+    assert list(df['Status'].cat.categories) == sorted(df['Status'].unique())
+
+
+def test_ndax_interpolation_exact():
+    # Interpolated values must match the reference to the last bit
+    ndax_file = os.path.join(nda_dir, 'github', 'Issue60', 'BTS85-36-6-5-110-20240424.ndax')
+    df = NewareNDA.read(ndax_file)
+    ref_df = pd.read_feather(os.path.join(
+        os.path.dirname(nda_dir), 'reference', 'BTS85-36-6-5-110-20240424.ftr'))
+    columns = ['Time', 'Charge_Capacity(mAh)', 'Discharge_Capacity(mAh)',
+               'Charge_Energy(mWh)', 'Discharge_Energy(mWh)']
+    pd.testing.assert_frame_equal(df[columns], ref_df[columns], check_exact=True)
+
+
+def test_cycle_number_missing_status():
+    # A missing Status is neither an incremental nor an off state
+    status = pd.Categorical(['CC_Chg', 'Rest', None, 'Rest', 'CC_Chg'],
+                            categories=['CC_Chg', 'Rest', 'SIM'])
+    cycle = _generate_cycle_number(pd.DataFrame({'Status': status}))
+    assert cycle.tolist() == [1, 1, 1, 1, 1]
+
+
+def _timestamp(series):
+    """Seconds since the epoch of a datetime Series. Naive times are taken as UTC."""
+    if series.dt.tz is None:
+        series = series.dt.tz_localize('UTC')
+    return (series - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)